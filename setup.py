@@ -17,6 +17,12 @@ setup (
         'matplotlib>=3.4.1',
         'numpy>=1.20.2',
     ],
+    extras_require={
+        'fast': [
+            'numba>=0.53.1',
+            'orjson>=3.6.0',
+        ],
+    },
 )
 
 ###############################################################################
@@ -3,37 +3,48 @@
 
 import argparse
 import json
-import matplotlib.pyplot as pp
 import numpy as np
 import os
 import re
 
 from datetime import date
+from functools import lru_cache
 from typing import List, Dict, Tuple, Any
 from numpy.random import default_rng as prng
 
+try:
+    from numba import njit ## optional: JIT compiled gini kernel
+except ImportError:
+    njit = None
+try:
+    import orjson ## optional: faster JSON parsing
+except ImportError:
+    orjson = None
+
+VALIDATORS_RE = re.compile(r'validators(\.[0-9]+)?\.json$')
+VALIDATORS_EXT_RE = re.compile(r'validators-ext(\.[0-9]+)?\.json$')
+
 ###############################################################################
 ###############################################################################
 
 def load(data_path: str) -> Tuple[np.array, np.array]:
     """validator weights and total weights (i.e. excl./incl. delegations)"""
-    ts = [] ## validator weight incl. delegators
-    ws = [] ## validator weight excl. delegators
-
     if args.extended:
-        pattern = r'validators-ext(.[0-9]+)?.json$'
+        pattern = VALIDATORS_EXT_RE
     else:
-        pattern = r'validators(.[0-9]+)?.json$'
+        pattern = VALIDATORS_RE
 
+    validators = []
     for p, dns, fns in os.walk(os.path.normpath(data_path)):
-        for fn in filter(lambda n: re.match(pattern, n), fns):
-            with open(os.path.join(p, fn)) as file:
-                validators = json.load(file)
-            if args.group:
-                validators = by_address(validators)
+        for fn in filter(pattern.match, fns):
+            validators.extend(load_json(os.path.join(p, fn)))
+    if args.group: ## once over all files
+        validators = by_address_weights(validators)
 
-            ts.extend(map(lambda v: v['totalWeight'], validators))
-            ws.extend(map(lambda v: v['weight'], validators))
+    ts = np.fromiter(map(lambda v: v['totalWeight'], validators),
+        dtype=np.float64, count=len(validators)) ## incl. delegators
+    ws = np.fromiter(map(lambda v: v['weight'], validators),
+        dtype=np.float64, count=len(validators)) ## excl. delegators
 
     if args.gini_00:
         ts = gini_00(ts)['pdf_normed']
@@ -41,10 +52,10 @@ def load(data_path: str) -> Tuple[np.array, np.array]:
         ts = gini_33(ts)['pdf_normed']
     elif args.gini_66:
         ts = gini_66(ts)['pdf_normed']
-    else:
-        ts = np.array(ts, dtype=np.float64)
-        ts_exp = ts**args.exponent
-        ts = ts_exp/np.max(ts_exp)*np.max(ts)
+    elif args.exponent != 1.0: ## identity mapping otherwise
+        ts_max = np.max(ts)
+        ts **= args.exponent ## in-place: no temporaries
+        ts *= ts_max/np.max(ts)
 
     if args.gini_00:
         ws = gini_00(ws)['pdf_normed']
@@ -52,34 +63,64 @@ def load(data_path: str) -> Tuple[np.array, np.array]:
         ws = gini_33(ws)['pdf_normed']
     elif args.gini_66:
         ws = gini_66(ws)['pdf_normed']
-    else:
-        ws = np.array(ws, dtype=np.float64)
-        ws_exp = ws**args.exponent
-        ws = ws_exp/np.max(ws_exp)*np.max(ws)
+    elif args.exponent != 1.0: ## identity mapping otherwise
+        ws_max = np.max(ws)
+        ws **= args.exponent ## in-place: no temporaries
+        ws *= ws_max/np.max(ws)
 
     return np.sort(ts), np.sort(ws)
 
-def by_address(validators: List[Any], groups={}) -> List[Any]:
+def load_json(json_path: str) -> Any:
+    """parsed JSON file (via orjson if available)"""
+    if orjson is not None:
+        with open(json_path, 'rb') as file:
+            return orjson.loads(file.read())
+    with open(json_path) as file:
+        return json.load(file)
+
+def by_address(validators: List[Any], groups=None) -> List[Any]:
     """groups validators by reward-addresses"""
+    if groups is None:
+        groups = {}
     for k, v in map(
-        lambda v: (frozenset(v['rewardAddresses']), v), validators
+        lambda v: (address_key(v['rewardAddresses']), v), validators
     ):
-        g = groups.get(k, {
+        g = groups.setdefault(k, {
             'id': set(),
-            'rewardAddresses': set(),
+            'rewardAddresses': set(k),
             'weight': 0,
             'delegatorWeight': 0,
             'totalWeight': 0
         })
         g['id'].update(v['id'] if type(v['id']) == list else [v['id']])
-        g['rewardAddresses'].update(v['rewardAddresses'])
         g['weight'] += v['weight']
         g['delegatorWeight'] += v['delegatorWeight']
         g['totalWeight'] += v['totalWeight']
-        groups[k] = g
 
     return groups.values()
 
+def by_address_weights(validators: List[Any], groups=None) -> List[Any]:
+    """groups validator weights by reward-addresses (w/o ids & addresses)"""
+    if groups is None:
+        groups = {}
+    for k, v in map(
+        lambda v: (address_key(v['rewardAddresses']), v), validators
+    ):
+        g = groups.setdefault(k, {
+            'weight': 0,
+            'delegatorWeight': 0,
+            'totalWeight': 0
+        })
+        g['weight'] += v['weight']
+        g['delegatorWeight'] += v['delegatorWeight']
+        g['totalWeight'] += v['totalWeight']
+
+    return groups.values()
+
+def address_key(addresses: List[str]) -> Tuple:
+    """hashable group key of reward-addresses (independent of order)"""
+    return tuple(sorted(addresses)) if len(addresses) > 1 else tuple(addresses)
+
 def load_cum(data_path: str) -> Tuple[
         np.array, np.array, np.array, np.array
     ]:
@@ -89,52 +130,97 @@ def load_cum(data_path: str) -> Tuple[
     cws = np.cumsum(ws) ## cum. weight excl. delegators
     return ts, cts, ws, cws
 
-def gini(a: np.array) -> np.float64:
-    """gini coefficient of inequality"""
-    # mean absolute difference
-    mad = np.abs(np.subtract.outer(a, a)).mean()
-    # mean absolute difference (relative) * 0.5
-    return mad/np.mean(a)*0.5
-
-def gini_pct(a: np.array) -> np.float64:
+def gini(a: np.array, presorted=False) -> np.float64:
+    """gini coefficient of inequality (of ascending values if presorted)"""
+    s = np.asarray(a, dtype=np.float64).ravel()
+    # clip rounding noise (of closed form & re-associated sums) for equal
+    # distributions, i.e. for all kernels
+    return np.maximum(_gini_sorted(s if presorted else np.sort(s)), 0.0)
+
+def _gini_sorted_np(s: np.array) -> np.float64:
+    """gini coefficient of sorted values (vectorized)"""
+    n, total = s.size, np.sum(s)
+    if n == 0 or total == 0:
+        return np.float64(0.0)
+    # mean absolute difference (relative) * 0.5 in closed form over the
+    # sorted values, i.e. O(n log n) w/o the n×n matrix of differences
+    i = np.arange(1, n+1, dtype=np.float64)
+    return np.sum((2*i - n - 1) * s)/(n*total)
+
+def _gini_sorted_nb(s: np.array) -> np.float64:
+    """gini coefficient of sorted values (fused loop)"""
+    n, acc, total = s.shape[0], 0.0, 0.0
+    for i in range(n):
+        acc += (2*(i+1) - n - 1) * s[i]
+        total += s[i]
+    if n == 0 or total == 0:
+        return 0.0
+    return acc/(n*total)
+
+if njit is not None:
+    _gini_sorted = njit(cache=True, fastmath=True)(_gini_sorted_nb)
+else:
+    _gini_sorted = _gini_sorted_np
+
+def gini_pct(a: np.array, presorted=False) -> np.float64:
     """gini coefficient of inequality in percentages"""
-    return 100*gini(a)
+    return 100*gini(a, presorted=presorted)
 
 def gini_00(a: np.array) -> Dict[str, np.array]:
     """perfectly equal distribution with GINI=00.0%"""
-    eql_a = np.ones(np.size(a))/np.size(a)
-    eql_a /= np.max(eql_a) ## normed
-    cum_a = np.cumsum(eql_a)
-    return {
-        'pdf': eql_a,
-        'pdf_normed': eql_a/np.sum(eql_a)*np.sum(a),
-        'cdf_normed': cum_a/np.max(cum_a)*np.max(a),
-    }
+    return gini_xx(*shape_00(np.size(a)), a)
 
 def gini_33(a: np.array) -> Dict[str, np.array]:
     """uniformly random distribution with GINI=33.3%"""
-    random = prng(seed=args.seed if args.seed else None)
-    uni_a = random.uniform(size=np.size(a))/np.size(a)
-    uni_a /= np.max(uni_a) ## normed
-    cum_a = np.cumsum(np.sort(uni_a))
-    return {
-        'pdf': uni_a,
-        'pdf_normed': uni_a/np.sum(uni_a)*np.sum(a),
-        'cdf_normed': cum_a/np.max(cum_a)*np.max(a),
-    }
+    if args.seed:
+        return gini_xx(*shape_33(np.size(a), args.seed), a)
+    return gini_xx(*_shape_33(np.size(a), None), a) ## fresh draws
 
 def gini_66(a: np.array) -> Dict[str, np.array]:
     """log-logistic distribution with GINI=66.6%"""
+    return gini_xx(*shape_66(np.size(a)), a)
+
+@lru_cache(maxsize=8)
+def shape_00(n: int) -> Tuple[np.array, np.array]:
+    """(cached) pdf & cdf of perfectly equal distribution"""
+    eql_a = np.ones(n) ## normed
+    return readonly(eql_a, np.cumsum(eql_a))
+
+@lru_cache(maxsize=8)
+def shape_33(n: int, seed: int) -> Tuple[np.array, np.array]:
+    """(cached) pdf & cdf of uniformly random distribution"""
+    return readonly(*_shape_33(n, seed))
+
+def _shape_33(n: int, seed: int) -> Tuple[np.array, np.array]:
+    """pdf & cdf of uniformly random distribution"""
+    random = prng(seed=seed)
+    uni_a = random.uniform(size=n)
+    uni_a /= np.max(uni_a) ## normed
+    cum_a = np.sort(uni_a)
+    return uni_a, np.cumsum(cum_a, out=cum_a) ## in sort buffer
+
+@lru_cache(maxsize=8)
+def shape_66(n: int) -> Tuple[np.array, np.array]:
+    """(cached) pdf & cdf of log-logistic distribution"""
     pdf_a = lambda b: lambda a: b*np.power(a, b-1)/np.power(1+np.power(a, b), 2)
-    random = prng(seed=args.seed if args.seed else None)
-    uni_a = random.uniform(size=np.size(a))/np.size(a)
-    log_a = pdf_a(5)(np.sort(uni_a))
+    ## mid-point quantiles of uniform samples in [0, 1/n)
+    uni_a = np.linspace(1/(2*n), 1-1/(2*n), n)/n
+    log_a = pdf_a(5)(uni_a)
     log_a /= np.max(log_a) ## normed
-    cum_a = np.cumsum(log_a)
+    return readonly(log_a, np.cumsum(log_a))
+
+def readonly(*arrays: np.array) -> Tuple[np.array, ...]:
+    """arrays flagged as read-only (e.g. for sharing from a cache)"""
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+def gini_xx(pdf: np.array, cdf: np.array, a: np.array) -> Dict[str, np.array]:
+    """reference pdf & cdf scaled to the total & maximum of a"""
     return {
-        'pdf': log_a,
-        'pdf_normed': log_a/np.sum(log_a)*np.sum(a),
-        'cdf_normed': cum_a/np.max(cum_a)*np.max(a),
+        'pdf': pdf,
+        'pdf_normed': pdf*(np.sum(a)/np.sum(pdf)),
+        'cdf_normed': cdf*(np.max(a)/cdf[-1]), ## cdf is ascending
     }
 
 def rotation(a: np.array, at: np.float64, delta=10) -> np.float64:
@@ -144,103 +230,115 @@ def rotation(a: np.array, at: np.float64, delta=10) -> np.float64:
 
 def sub_directory(path: str, index=-1) -> str:
     """(by default last) sub-directory beneath a given path"""
-    sub_directory = sorted(next(os.walk(path))[1])[index]
+    with os.scandir(path) as entries:
+        sub_directory = sorted(e.name for e in entries if e.is_dir())[index]
     sub_directory = os.path.join(path, sub_directory)
     return os.path.normpath(sub_directory)
 
 def plot_distribution(path: str):
     """plot (cum.) validator stake distribution"""
+    import matplotlib ## deferred: only needed for plotting
+    if not args.show:
+        matplotlib.use('Agg') ## skip interactive backend probing
+    import matplotlib.pyplot as pp
+
     path = os.path.normpath(path) if path else sub_directory('./json')
     ts, cts, ws, cws = load_cum(path) ## weights & total weights
     a_date = date.fromisoformat(path.split('/').pop())
 
-    cts_g00, ccts_g00 = [gini_00(cts)[n] for n in ('pdf', 'cdf_normed')]
-    cts_g33, ccts_g33 = [gini_33(cts)[n] for n in ('pdf', 'cdf_normed')]
-    cts_g66, ccts_g66 = [gini_66(cts)[n] for n in ('pdf', 'cdf_normed')]
+    cts_g00, ccts_g00 = map(gini_00(cts).get, ('pdf', 'cdf_normed'))
+    cts_g33, ccts_g33 = map(gini_33(cts).get, ('pdf', 'cdf_normed'))
+    cts_g66, ccts_g66 = map(gini_66(cts).get, ('pdf', 'cdf_normed'))
 
-    quorum_pct1 = 0.70 ## 14 of 20 peers sampled
-    quorum_ctr1 = np.max(cts) * (1.00 - quorum_pct1)
-    quorum_idx1 = cts.size - np.sum(cts > quorum_ctr1)
+    gini_ts = gini_pct(ts, presorted=True) ## incl. delegators
+    gini_ws = gini_pct(ws, presorted=True) ## excl. delegators
+    gini_g00, gini_g33, gini_g66 = map(gini_pct, (cts_g00, cts_g33, cts_g66))
 
-    quorum_pct2 = 0.30 ## for annotation only!
-    quorum_ctr2 = np.max(cts) * (1.00 - quorum_pct2)
-    quorum_idx2 = cts.size - np.sum(cts > quorum_ctr2)
+    cts_max = cts[-1] ## cumulative, i.e. ascending
+    ts_max = ts[-1] ## sorted, i.e. ascending
+    xs = np.arange(cts.size) ## shared by all (equally sized) curves
 
-    quorum_pct3 = 0.25 ## for annotation only!
-    quorum_ctr3 = np.max(cts) * (1.00 - quorum_pct3)
-    quorum_idx3 = cts.size - np.sum(cts > quorum_ctr3)
+    quorum_pcts = np.array([
+        0.70, ## 14 of 20 peers sampled
+        0.30, ## for annotation only!
+        0.25, ## for annotation only!
+    ])
+    quorum_ctrs = cts_max * (1.00 - quorum_pcts)
+    quorum_idxs = np.searchsorted(cts, quorum_ctrs, side='right')
+    quorum_ctr1, quorum_ctr2, quorum_ctr3 = quorum_ctrs
+    quorum_idx1, quorum_idx2, quorum_idx3 = quorum_idxs
 
-    pp.figure(figsize=(21.5, 9.0))
+    fig = pp.figure(figsize=(21.5, 9.0))
 
     ###########################################################################
-    ax = pp.subplot(3, 1, (1,2))
+    ax = fig.add_subplot(3, 1, (1,2))
     ###########################################################################
 
-    pp.title(f'(Cumulative) Stake Distribution of Avalanche Validators [{a_date}]', weight='bold')
-    pp.ylabel('Cum. Stake [{:.1f}M $AVAX]'.format(np.max(cts)/1e15))
-    pp.xlim(0, cts.size)
-    pp.ylim(0, np.max(cts))
+    ax.set_title(f'(Cumulative) Stake Distribution of Avalanche Validators [{a_date}]', weight='bold')
+    ax.set_ylabel('Cum. Stake [{:.1f}M $AVAX]'.format(cts_max/1e15))
+    ax.set_xlim(0, cts.size)
+    ax.set_ylim(0, cts_max)
 
     ax.fill_between(
-        np.arange(cts.size), cts, color='lightcoral')
+        xs, cts, color='lightcoral')
     ax.plot(
-        np.arange(cts.size), cts, color='darkred', linestyle='-', linewidth=2, zorder=3,
-        label='cum. stake of validators incl. delegations (GINI={:04.1f}%)'.format(gini_pct(ts)))
+        xs, cts, color='darkred', linestyle='-', linewidth=2, zorder=3,
+        label='cum. stake of validators incl. delegations (GINI={:04.1f}%)'.format(gini_ts))
     ax.fill_between(
-        np.arange(cws.size), cws, color='lightblue')
+        xs, cws, color='lightblue')
     ax.plot(
-        np.arange(cws.size), cws, color='darkblue', linestyle='-', linewidth=2,
-        label='cum. stake of validators excl. delegations (GINI={:04.1f}%)'.format(gini_pct(ws)))
+        xs, cws, color='darkblue', linestyle='-', linewidth=2,
+        label='cum. stake of validators excl. delegations (GINI={:04.1f}%)'.format(gini_ws))
 
     ax.plot(
-        np.arange(ts.size), ccts_g66, color='black', linestyle=':', linewidth=1)
+        xs, ccts_g66, color='black', linestyle=':', linewidth=1)
     ax.plot(
-        np.arange(ts.size), ccts_g33, color='black', linestyle=':', linewidth=1)
+        xs, ccts_g33, color='black', linestyle=':', linewidth=1)
     ax.plot(
-        np.arange(ts.size), ccts_g00, color='black', linestyle=':', linewidth=1)
+        xs, ccts_g00, color='black', linestyle=':', linewidth=1)
 
     at = int(np.round(cts.size*2/3))
-    pp.annotate(
-        'GINI={:.1f}%'.format(gini_pct(cts_g66)), (at, ccts_g66[at]),
+    ax.annotate(
+        'GINI={:.1f}%'.format(gini_g66), (at, ccts_g66[at]),
         bbox=dict(boxstyle='round', fc='white', lw=0), weight='bold',
         fontsize=8, rotation=rotation(ccts_g66, at))
 
     at = int(np.round(ts.size*1/2))
-    pp.annotate(
-        'GINI={:.1f}%'.format(gini_pct(cts_g33)), (at, ccts_g33[at]),
+    ax.annotate(
+        'GINI={:.1f}%'.format(gini_g33), (at, ccts_g33[at]),
         bbox=dict(boxstyle='round', fc='white', lw=0), weight='bold',
         fontsize=8, rotation=rotation(ccts_g33, at))
 
     at = int(np.round(cts.size*1/3))
-    pp.annotate(
-        'GINI={:.1f}%'.format(gini_pct(cts_g00)), (at, ccts_g00[at]),
+    ax.annotate(
+        'GINI={:.1f}%'.format(gini_g00), (at, ccts_g00[at]),
         bbox=dict(boxstyle='round', fc='white', lw=0), weight='bold',
         fontsize=8, rotation=rotation(ccts_g00, at))
 
     if not args.gini_33:
 
-        pp.scatter(
+        ax.scatter(
             quorum_idx1, quorum_ctr1, color='black', zorder=10, s=36)
-        pp.scatter(
+        ax.scatter(
             quorum_idx1, quorum_ctr1, color='white', zorder=11, s=8)
-        pp.annotate(
+        ax.annotate(
             '({:.0f}, {:.1f}M)'.format(quorum_idx1, quorum_ctr1/1e15),
             (quorum_idx1, quorum_ctr1), weight='bold', color='white', fontsize=9,
             xytext=(-5, -2), ha='center', va='top', textcoords='offset points', rotation=90)
-        pp.annotate(
+        ax.annotate(
             '({:.0f}, {:.1f}M)'.format(quorum_idx1, quorum_ctr1/1e15),
             (quorum_idx1, quorum_ctr1), weight='bold', color='black', fontsize=9,
             xytext=(-6, -1), ha='center', va='top', textcoords='offset points', rotation=90)
 
-        pp.scatter(
+        ax.scatter(
             quorum_idx2, quorum_ctr2, color='black', zorder=10, s=36)
-        pp.scatter(
+        ax.scatter(
             quorum_idx2, quorum_ctr2, color='white', zorder=11, s=8)
-        pp.annotate(
+        ax.annotate(
             '({:.0f}, {:.1f}M)'.format(quorum_idx2, quorum_ctr2/1e15),
             (quorum_idx2, quorum_ctr2), weight='bold', color='white', fontsize=9,
             xytext=(-5, -2), ha='center', va='top', textcoords='offset points', rotation=90)
-        pp.annotate(
+        ax.annotate(
             '({:.0f}, {:.1f}M)'.format(quorum_idx2, quorum_ctr2/1e15),
             (quorum_idx2, quorum_ctr2), weight='bold', color='black', fontsize=9,
             xytext=(-6, -1), ha='center', va='top', textcoords='offset points', rotation=90)
@@ -251,8 +349,8 @@ def plot_distribution(path: str):
     ax.axvline(
         x=quorum_idx2, label='70%-vs-30% split: LHS controls 70% & RHS 30%',
         color='black', linestyle='-.', linewidth=2)
-    pp.annotate(
-        'GINI={:.1f}%'.format(gini_pct(ts)), (quorum_idx3, quorum_ctr3),
+    ax.annotate(
+        'GINI={:.1f}%'.format(gini_ts), (quorum_idx3, quorum_ctr3),
         bbox=dict(boxstyle='rarrow', fc='lightcoral', ec='darkred', alpha=0.9, lw=2),
         xytext=(-28, 0), weight='bold', color='darkred', fontsize=28,
         ha='right', va='center', textcoords='offset points')
@@ -266,28 +364,28 @@ def plot_distribution(path: str):
     ax.legend(loc='upper left')
 
     ###########################################################################
-    ax = pp.subplot(3, 1, (3,3))
+    ax = fig.add_subplot(3, 1, (3,3))
     ###########################################################################
 
     if not args.group:
-        pp.xlabel('Validators [{:d}]'.format(cts.size))
+        ax.set_xlabel('Validators [{:d}]'.format(cts.size))
     else:
-        pp.xlabel('Validators by Reward Address [{:d}]'.format(cts.size))
+        ax.set_xlabel('Validators by Reward Address [{:d}]'.format(cts.size))
 
-    pp.ylabel('Stake [$AVAX]')
-    pp.xlim(0, ts.size)
-    pp.ylim(0, np.max(ts))
+    ax.set_ylabel('Stake [$AVAX]')
+    ax.set_xlim(0, ts.size)
+    ax.set_ylim(0, ts_max)
 
     ax.fill_between(
-        np.arange(ts.size), ts, color='lightcoral')
+        xs, ts, color='lightcoral')
     ax.plot(
-        np.arange(ts.size), ts, color='darkred', linestyle='-', linewidth=2, zorder=3,
-        label='stake of validators incl. delegations (GINI={:04.1f}%)'.format(gini_pct(ts)))
+        xs, ts, color='darkred', linestyle='-', linewidth=2, zorder=3,
+        label='stake of validators incl. delegations (GINI={:04.1f}%)'.format(gini_ts))
     ax.fill_between(
-        np.arange(ws.size), ws, color='lightblue')
+        xs, ws, color='lightblue')
     ax.plot(
-        np.arange(ws.size), ws, color='darkblue', linestyle='-', linewidth=2,
-        label='stake of validators excl. delegations (GINI={:04.1f}%)'.format(gini_pct(ws)))
+        xs, ws, color='darkblue', linestyle='-', linewidth=2,
+        label='stake of validators excl. delegations (GINI={:04.1f}%)'.format(gini_ws))
     ax.axvline(
         x=quorum_idx1, color='black', linestyle='-.', linewidth=2)
     ax.axvline(
@@ -302,12 +400,13 @@ def plot_distribution(path: str):
     ax.legend(loc='upper left')
 
     if args.group:
-        pp.savefig(f'image/{a_date}G.svg')
+        fig.savefig(f'image/{a_date}G.svg')
     else:
-        pp.savefig(f'image/{a_date}.svg')
+        fig.savefig(f'image/{a_date}.svg')
 
     if args.show:
         pp.show()
+    pp.close(fig)
 
 ###############################################################################
 ###############################################################################